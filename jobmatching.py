@@ -1,139 +1,335 @@
+import logging
+import os
+import platform
+import queue
+import re
+import threading
+
+# CPUs this process may actually run on (honours affinity and cpusets,
+# unlike os.cpu_count())
+if hasattr(os, "sched_getaffinity"):
+    AVAILABLE_CPUS = len(os.sched_getaffinity(0))
+else:
+    AVAILABLE_CPUS = os.cpu_count() or 1
+
+# Pin BLAS/OpenMP threads before torch is imported: container defaults are
+# often wrong, and MiniLM encoding stops scaling beyond ~4-8 cores. A value
+# already set in the environment wins, for torch and onnxruntime too.
+os.environ.setdefault("OMP_NUM_THREADS", str(min(8, AVAILABLE_CPUS)))
+os.environ.setdefault("MKL_NUM_THREADS", os.environ["OMP_NUM_THREADS"])
+
+def model_threads():
+    # OMP_NUM_THREADS may be a nested-parallelism list ("4,2"); the first
+    # field is the outer level. Anything unusable gets the default cap.
+    value = os.environ["OMP_NUM_THREADS"].split(",")[0].strip()
+    if value.isdigit() and int(value) > 0:
+        return int(value)
+    return min(8, AVAILABLE_CPUS)
+
+MODEL_THREADS = model_threads()
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import streamlit as st
-from pypdf import PdfReader
+import torch
+import pypdfium2 as pdfium
 from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-import re
+
+# Optional keyword scanners: Hyperscan (SIMD, x86 only), then Aho-Corasick,
+# then plain substring checks
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
 
 # OCR imports
 from pdf2image import convert_from_bytes
 import pytesseract
 
 # ---------------- LOAD EMBEDDING MODEL ----------------
-@st.cache_resource
+def onnx_model_file():
+    # The Hub repo ships int8 exports tuned per instruction set; pick the one
+    # this CPU can actually run fast
+    machine = platform.machine().lower()
+    if machine in ("arm64", "aarch64"):
+        return "onnx/model_qint8_arm64.onnx"
+    if machine not in ("x86_64", "amd64"):
+        return "onnx/model.onnx"
+
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+    except OSError:
+        # No cpuinfo (macOS/Windows): AVX2 is on every x86-64 CPU since 2013
+        return "onnx/model_quint8_avx2.onnx"
+    if "avx512_vnni" in flags:
+        return "onnx/model_qint8_avx512_vnni.onnx"
+    if "avx2" in flags:
+        return "onnx/model_quint8_avx2.onnx"
+    return "onnx/model.onnx"
+
 def load_model():
-    return SentenceTransformer("all-MiniLM-L6-v2")
+    torch.set_num_threads(MODEL_THREADS)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Only settable once per process, e.g. not after a cache clear
+        pass
 
-embed_model = load_model()
+    # int8-quantized ONNX export of MiniLM runs ~3-4x faster than torch on CPU
+    try:
+        import onnxruntime
+
+        session_options = onnxruntime.SessionOptions()
+        session_options.intra_op_num_threads = MODEL_THREADS
+        session_options.inter_op_num_threads = 1
+        return SentenceTransformer(
+            "all-MiniLM-L6-v2",
+            backend="onnx",
+            model_kwargs={
+                "file_name": onnx_model_file(),
+                "session_options": session_options
+            }
+        )
+    except Exception as e:
+        logging.getLogger(__name__).warning(
+            "ONNX backend unavailable, falling back to torch: %s", e
+        )
+        # Fallback: regular torch weights if onnxruntime/optimum is missing
+        return SentenceTransformer("all-MiniLM-L6-v2")
 
 # ---------------- CANONICAL SKILL EXTRACTION ----------------
-def extract_canonical_skills(text):
-    text = text.lower()
-    skills = set()
-
+CANONICAL_SKILLS = {
     # 🔹 Digital Marketing
-    if any(k in text for k in [
+    "digital marketing": [
         "seo", "sem", "digital marketing", "content marketing",
         "google ads", "facebook ads", "social media marketing"
-    ]):
-        skills.add("digital marketing")
+    ],
 
     # 🔹 Software Development
-    if any(k in text for k in [
+    "software development": [
         "software", "developer", "engineering",
         "java", "python", "c++", "javascript",
         "html", "css", "sql", "spring", "django", "flask"
-    ]):
-        skills.add("software development")
+    ],
 
     # 🔹 Web Development
-    if any(k in text for k in [
+    "web development": [
         "web developer", "frontend", "backend", "full stack",
         "react", "angular", "vue", "node", "express"
-    ]):
-        skills.add("web development")
+    ],
 
     # 🔹 UI / UX Design
-    if any(k in text for k in [
+    "ui ux design": [
         "ui", "ux", "user interface", "user experience",
         "figma", "adobe xd", "wireframe", "prototype"
-    ]):
-        skills.add("ui ux design")
+    ],
 
     # 🔹 Machine Learning / AI
-    if any(k in text for k in [
+    "machine learning": [
         "ai", "ml", "machine learning", "deep learning",
         "cnn", "rnn", "nlp", "computer vision"
-    ]):
-        skills.add("machine learning")
+    ],
 
     # 🔹 Data Science / Data Analytics
-    if any(k in text for k in [
+    "data science": [
         "data scientist", "data science", "data analyst",
         "pandas", "numpy", "matplotlib", "statistics",
         "power bi", "tableau", "excel"
-    ]):
-        skills.add("data science")
+    ],
 
     # 🔹 Cloud & DevOps
-    if any(k in text for k in [
+    "cloud devops": [
         "aws", "azure", "gcp", "cloud computing",
         "devops", "docker", "kubernetes", "ci/cd"
-    ]):
-        skills.add("cloud devops")
+    ],
 
     # 🔹 Cybersecurity
-    if any(k in text for k in [
+    "cybersecurity": [
         "cyber security", "cybersecurity", "ethical hacking",
         "penetration testing", "network security", "soc"
-    ]):
-        skills.add("cybersecurity")
+    ],
 
     # 🔹 Mobile App Development
-    if any(k in text for k in [
+    "mobile app development": [
         "android", "ios", "mobile app", "flutter",
         "react native", "kotlin", "swift"
-    ]):
-        skills.add("mobile app development")
+    ],
 
     # 🔹 Testing / QA
-    if any(k in text for k in [
+    "software testing": [
         "software testing", "qa", "quality assurance",
         "manual testing", "automation testing",
         "selenium", "junit"
-    ]):
-        skills.add("software testing")
+    ],
 
     # 🔹 Business / Management
-    if any(k in text for k in [
+    "business management": [
         "business analyst", "project manager",
         "product manager", "agile", "scrum"
-    ]):
-        skills.add("business management")
+    ],
 
     # 🔹 Finance / Accounting
-    if any(k in text for k in [
+    "finance accounting": [
         "finance", "accounting", "tally", "gst",
         "auditing", "financial analysis"
-    ]):
-        skills.add("finance accounting")
+    ],
 
     # 🔹 HR / Recruitment
-    if any(k in text for k in [
+    "human resources": [
         "human resources", "hr", "recruitment",
         "talent acquisition", "payroll"
-    ]):
-        skills.add("human resources")
+    ],
+}
+
+# Skill sets are int bitmasks, one bit per canonical label, so set algebra
+# on them is plain integer &, ~ and bit_count()
+CANONICAL_LABELS = list(CANONICAL_SKILLS)
+LABEL_BIT = {label: 1 << i for i, label in enumerate(CANONICAL_LABELS)}
+
+# keyword -> bitmask of the canonical labels it implies
+SKILL_KEYWORDS = {}
+for label, keywords in CANONICAL_SKILLS.items():
+    for keyword in keywords:
+        SKILL_KEYWORDS[keyword] = SKILL_KEYWORDS.get(keyword, 0) | LABEL_BIT[label]
+
+# Scanners are built once per process, not on every Streamlit rerun
+@st.cache_resource
+def load_hyperscan_db():
+    # Hyperscan compiles every keyword into one SIMD-accelerated DFA; the
+    # match ids index KEYWORD_BITS
+    db = hyperscan.Database()
+    db.compile(
+        expressions=[re.escape(k).encode() for k in SKILL_KEYWORDS],
+        ids=list(range(len(SKILL_KEYWORDS))),
+        flags=[hyperscan.HS_FLAG_SINGLEMATCH] * len(SKILL_KEYWORDS)
+    )
+    # Scratch space can't be shared by concurrent scans. Idle scratches are
+    # pooled here; Streamlit starts a new thread per run, so a thread-local
+    # would never be reused.
+    return db, queue.SimpleQueue()
+
+@st.cache_resource
+def load_skill_automaton():
+    # One automaton over every keyword: a single pass over the text reports
+    # all (overlapping) keyword hits instead of one substring scan per keyword
+    automaton = ahocorasick.Automaton()
+    for keyword, bits in SKILL_KEYWORDS.items():
+        automaton.add_word(keyword, bits)
+    automaton.make_automaton()
+    return automaton
+
+if hyperscan is not None:
+    KEYWORD_BITS = list(SKILL_KEYWORDS.values())
+    SKILL_DB, scratch_pool = load_hyperscan_db()
+elif ahocorasick is not None:
+    SKILL_AUTOMATON = load_skill_automaton()
+
+def extract_canonical_skills(text):
+    text = text.lower()
+    skills = 0
+
+    if hyperscan is not None:
+        try:
+            scratch = scratch_pool.get_nowait()
+        except queue.Empty:
+            scratch = hyperscan.Scratch(SKILL_DB)
+
+        def on_match(keyword_id, start, end, flags, context):
+            nonlocal skills
+            skills |= KEYWORD_BITS[keyword_id]
+
+        try:
+            SKILL_DB.scan(
+                text.encode(),
+                match_event_handler=on_match,
+                scratch=scratch
+            )
+        finally:
+            scratch_pool.put(scratch)
+    elif ahocorasick is not None:
+        for _, bits in SKILL_AUTOMATON.iter(text):
+            skills |= bits
+    else:
+        # No scanner package installed: plain substring checks per label
+        for label, keywords in CANONICAL_SKILLS.items():
+            if any(k in text for k in keywords):
+                skills |= LABEL_BIT[label]
 
     return skills
 
+def skill_labels(skills):
+    # Bitmask -> label names, in CANONICAL_SKILLS order
+    return [label for label in CANONICAL_LABELS if skills & LABEL_BIT[label]]
+
+# ---------------- SKILL EMBEDDINGS ----------------
+# Skills only ever come from the fixed label set above, so each label is
+# embedded once and requests never need a model forward pass. The model is
+# a local here: only the label vectors are cached, and MiniLM is freed.
+@st.cache_resource
+def load_label_embeddings():
+    embeddings = load_model().encode(
+        CANONICAL_LABELS,
+        normalize_embeddings=True,
+        convert_to_numpy=True,
+        show_progress_bar=False
+    )
+    # float64 so single and batch scoring round to the same 2 decimals
+    return dict(zip(CANONICAL_LABELS, embeddings.astype(np.float64)))
+
+LABEL_EMBEDDINGS = load_label_embeddings()
+# (labels, dim) matrix, rows in LABEL_BIT order, for batch scoring
+LABEL_MATRIX = np.stack([LABEL_EMBEDDINGS[label] for label in CANONICAL_LABELS])
+
+def skills_embedding(skills):
+    # Sum of the label embeddings, re-normalized so cosine is a dot product
+    emb = sum(LABEL_EMBEDDINGS[skill] for skill in skill_labels(skills))
+    return emb / np.sqrt(emb @ emb)
+
 # ---------------- OCR FUNCTION ----------------
+# Each tesseract process already runs up to 4 OpenMP threads, so only
+# one page per 4 CPUs is OCR'd at a time to avoid oversubscription
+OCR_WORKERS = max(1, AVAILABLE_CPUS // 4)
+
 def extract_text_with_ocr(pdf_file):
-    images = convert_from_bytes(pdf_file.read())
-    text = ""
-    for img in images:
-        text += pytesseract.image_to_string(img) + " "
+    # pdftoppm workers are single-threaded: one per available CPU
+    images = convert_from_bytes(
+        pdf_file.read(), dpi=200, thread_count=AVAILABLE_CPUS
+    )
+    # pytesseract runs the tesseract binary per page, so pages OCR in parallel
+    with ThreadPoolExecutor(max_workers=OCR_WORKERS) as executor:
+        text = " ".join(executor.map(pytesseract.image_to_string, images))
     return clean_text(text)
 
 # ---------------- PDF + TEXT UTILS ----------------
+# PDFium is not thread-safe, even across documents, and every Streamlit
+# session runs on its own thread: all pdfium calls go through this lock.
+# Cached as a resource so reruns and sessions share the same lock.
+@st.cache_resource
+def load_pdfium_lock():
+    return threading.Lock()
+
+pdfium_lock = load_pdfium_lock()
+
 def extract_text_from_pdf(pdf_file):
     text = ""
 
-    # 1️⃣ Try PyPDF first
+    # 1️⃣ Try pdfium first (C++ backend, much faster than pure-Python parsers)
     try:
-        reader = PdfReader(pdf_file)
-        for page in reader.pages:
-            if page.extract_text():
-                text += page.extract_text() + " "
+        with pdfium_lock:
+            pdf = pdfium.PdfDocument(pdf_file)
+            try:
+                text = " ".join(
+                    page.get_textpage().get_text_range() for page in pdf
+                )
+            finally:
+                pdf.close()
     except:
         pass
 
@@ -141,10 +337,11 @@ def extract_text_from_pdf(pdf_file):
     if not text.strip():
         try:
             import pdfplumber
+            pdf_file.seek(0)
             with pdfplumber.open(pdf_file) as pdf:
-                for page in pdf.pages:
-                    if page.extract_text():
-                        text += page.extract_text() + " "
+                text = " ".join(
+                    page.extract_text() or "" for page in pdf.pages
+                )
         except:
             pass
 
@@ -159,28 +356,48 @@ def extract_text_from_pdf(pdf_file):
     return clean_text(text)
 
 def clean_text(text):
-    return re.sub(r"\s+", " ", text).strip()
+    # str.split() already splits on any Unicode whitespace and drops the ends
+    return " ".join(text.split())
 
 # ---------------- SCORING FUNCTIONS ----------------
 def semantic_match_score(resume_skills, jd_skills):
-    embeddings = embed_model.encode([
-        " ".join(resume_skills),
-        " ".join(jd_skills)
-    ])
-    score = cosine_similarity([embeddings[0]], [embeddings[1]])[0][0]
+    if not resume_skills or not jd_skills:
+        return 0.0
+    if resume_skills == jd_skills:
+        # Identical skill sets (e.g. the JD fallback) are a perfect match
+        return 100.0
+    score = float(skills_embedding(resume_skills) @ skills_embedding(jd_skills))
     return round(score * 100, 2)
 
+def semantic_match_scores(resume_skill_sets, jd_skills):
+    # Many resumes vs one JD: the (N, labels) bit matrix times LABEL_MATRIX
+    # gives every resume vector at once, then one matrix-vector product
+    masks = np.array(resume_skill_sets, dtype=np.int64)
+    if not jd_skills or masks.size == 0:
+        return [0.0 for _ in resume_skill_sets]
+
+    shifts = np.arange(len(CANONICAL_LABELS))
+    bits = ((masks[:, None] >> shifts) & 1).astype(LABEL_MATRIX.dtype)
+    resume_embs = bits @ LABEL_MATRIX
+    norms = np.sqrt(np.einsum("ij,ij->i", resume_embs, resume_embs))
+    resume_embs /= np.where(norms, norms, 1)[:, None]
+
+    # Empty resumes have a zero vector and score 0; identical sets score 100
+    scores = resume_embs @ skills_embedding(jd_skills)
+    scores = np.where(masks == jd_skills, 1.0, scores)
+    return [round(float(score) * 100, 2) for score in scores]
+
 def keyword_match_score(resume_skills, jd_skills):
     if not jd_skills:
         return 0.0
-    matched = resume_skills.intersection(jd_skills)
-    return round((len(matched) / len(jd_skills)) * 100, 2)
+    matched = resume_skills & jd_skills
+    return round((matched.bit_count() / jd_skills.bit_count()) * 100, 2)
 
 # ---------------- FEEDBACK ----------------
 def generate_ai_feedback(final_score, resume_skills, jd_skills):
-    matched = resume_skills & jd_skills
-    missing = jd_skills - resume_skills
-    extra = resume_skills - jd_skills
+    matched = skill_labels(resume_skills & jd_skills)
+    missing = skill_labels(jd_skills & ~resume_skills)
+    extra = skill_labels(resume_skills & ~jd_skills)
 
     return f"""
 📊 Match Score: {final_score}%
@@ -253,7 +470,7 @@ if st.button("🔍 Analyze Resume"):
             jd_skills = extract_canonical_skills(jd_text)
 
             if not jd_skills:
-                jd_skills = resume_skills.copy()
+                jd_skills = resume_skills
 
             semantic_score = semantic_match_score(resume_skills, jd_skills)
             keyword_score = keyword_match_score(resume_skills, jd_skills)